@@ -0,0 +1,47 @@
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pytest
+from numpy.typing import NDArray
+
+from skqulacs.circuit import create_farhi_neven_ansatz
+from skqulacs.qnn import QNNClassifier
+from skqulacs.qnn.solver import Bfgs
+
+n_qubit = 12
+n_sample = 64
+num_class = 3
+
+
+def create_problem() -> Tuple[NDArray[np.float_], NDArray[np.int_]]:
+    rng = np.random.default_rng(0)
+    x = rng.uniform(-1.0, 1.0, size=(n_sample, 4))
+    y = rng.integers(0, num_class, size=n_sample)
+    return x, y
+
+
+# Compare the results of each group to see the speedup by `n_jobs`.
+# It is only visible on a machine with as many CPU cores as `n_jobs`.
+@pytest.mark.benchmark(group="cost_func_grad")
+@pytest.mark.parametrize("n_jobs", [None, 2, 4])
+def test_cost_func_grad(benchmark: Any, n_jobs: Optional[int]) -> None:
+    x, y = create_problem()
+    circuit = create_farhi_neven_ansatz(n_qubit, 3, 0)
+    qcl = QNNClassifier(circuit, num_class, Bfgs(), do_x_scale=False, n_jobs=n_jobs)
+    theta = circuit.get_parameters()
+
+    def setup() -> Tuple[Tuple[Any, ...], Dict[str, Any]]:
+        # Do not reuse the prediction of the previous round.
+        qcl._pred_cache = None
+        return (theta, x, y), {}
+
+    benchmark.pedantic(qcl._cost_func_grad, setup=setup, rounds=5)
+
+
+@pytest.mark.benchmark(group="predict_inner")
+@pytest.mark.parametrize("n_jobs", [None, 2, 4])
+def test_predict_inner(benchmark: Any, n_jobs: Optional[int]) -> None:
+    x, _ = create_problem()
+    circuit = create_farhi_neven_ansatz(n_qubit, 3, 0)
+    qcl = QNNClassifier(circuit, num_class, Bfgs(), do_x_scale=False, n_jobs=n_jobs)
+    benchmark.pedantic(qcl._predict_inner, args=[x], rounds=5)
@@ -1,6 +1,7 @@
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from enum import Enum, auto
-from typing import Callable, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 import numpy as np
 from numpy.typing import NDArray
@@ -106,8 +107,17 @@ class LearningCircuit:
     4. Compute optimized learning parameters in a certain way.
     5. Update the learning parameters in the circuit with the optimized ones by `LearningCircuit.update_parameters()`.
 
+    ## Caching
+
+    If `cache_size` is positive, `LearningCircuit.run_state_vector()` keeps state vectors of
+    the latest `cache_size` inputs and reuses them until learning parameters or gates are changed.
+    The cache is not used if the circuit has a gate which is both learning and input one,
+    because such gate changes its parameter in every execution.
+    Copies of the circuit, including those sent to worker processes by joblib, start with an empty cache.
+
     Args:
         n_qubit: The number of qubits in the circuit.
+        cache_size: The number of state vectors cached by `run_state_vector()`. 0 disables the cache.
 
     Examples:
         >>> from skqulacs.circuit import LearningCircuit
@@ -124,6 +134,7 @@ class LearningCircuit:
     """
 
     n_qubit: int
+    cache_size: int = field(default=0)
     # ParametricQuantumCircuit does not have a function to compare by value, so exclude from comparison of LearningCircuit for now.
     _circuit: ParametricQuantumCircuit = field(init=False, compare=False)
     _learning_parameter_list: List[_LearningParameter] = field(
@@ -132,16 +143,33 @@ class LearningCircuit:
     _input_parameter_list: List[_InputParameter] = field(
         init=False, default_factory=list
     )
+    # Incremented when `update_parameters()` changes learning parameters to invalidate cached state vectors.
+    _theta_generation: int = field(init=False, default=0, compare=False)
+    _state_vector_cache: "OrderedDict[Tuple[bytes, int, int], NDArray[np.complex_]]" = (
+        field(init=False, default_factory=OrderedDict, compare=False)
+    )
 
     def __post_init__(self) -> None:
         self._circuit = ParametricQuantumCircuit(self.n_qubit)
 
+    def __getstate__(self) -> Dict[str, Any]:
+        # Cached state vectors are not copied when the circuit is pickled to send it to other processes.
+        state = self.__dict__.copy()
+        state["_state_vector_cache"] = OrderedDict()
+        return state
+
     def update_parameters(self, theta: List[float]) -> None:
         """Update learning parameter of the circuit with given `theta`.
 
         Args:
             theta: New learning parameters.
         """
+        # Optimizers often pass the same parameters again, e.g. for the gradient after the cost.
+        if any(
+            theta[parameter.parameter_id] != parameter.value
+            for parameter in self._learning_parameter_list
+        ):
+            self._theta_generation += 1
         for parameter in self._learning_parameter_list:
             parameter_value = theta[parameter.parameter_id]
             parameter.value = parameter_value
@@ -184,6 +212,40 @@ class LearningCircuit:
         self._circuit.update_quantum_state(state)
         return state
 
+    def run_state_vector(self, x: List[float] = list()) -> NDArray[np.complex_]:
+        """Same as `run(x).get_vector()`, but the state vector is reused from cache if possible.
+        The returned array is read-only because it may be shared with later calls.
+
+        Arguments:
+            x: Input data whose shape is (n_features,).
+
+        Returns:
+            State vector of the quantum state applied the circuit.
+        """
+        use_cache = self.cache_size > 0 and all(
+            parameter.companion_parameter_id is None
+            for parameter in self._input_parameter_list
+        )
+        if not use_cache:
+            return self.run(x).get_vector()
+
+        key = (
+            np.asarray(x, dtype=np.float64).tobytes(),
+            self._theta_generation,
+            self._circuit.get_gate_count(),
+        )
+        state_vec = self._state_vector_cache.get(key)
+        if state_vec is not None:
+            self._state_vector_cache.move_to_end(key)
+            return state_vec
+
+        state_vec = self.run(x).get_vector()
+        state_vec.setflags(write=False)
+        self._state_vector_cache[key] = state_vec
+        while len(self._state_vector_cache) > self.cache_size:
+            self._state_vector_cache.popitem(last=False)
+        return state_vec
+
     def run_x_no_change(self) -> QuantumState:
         """
         Run the circuit while x is not changed from the previous run.
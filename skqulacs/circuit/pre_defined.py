@@ -142,18 +142,16 @@ def create_farhi_neven_ansatz(
     rng = default_rng(seed)
     for _ in range(c_depth):
         rng.shuffle(zyu)
-
+        # Draw all angles of this layer at once. The order of random numbers is the same as drawing one by one.
+        angles = 2.0 * np.pi * rng.random(size=(n_qubit // 2, 4))
         for i in range(0, n_qubit - 1, 2):
-            angle_x = 2.0 * np.pi * rng.random()
-            angle_y = 2.0 * np.pi * rng.random()
+            angle_x, angle_y, angle_x_inv, angle_y_inv = angles[i // 2]
             circuit.add_CNOT_gate(zyu[i + 1], zyu[i])
             circuit.add_parametric_RX_gate(zyu[i], angle_x)
             circuit.add_parametric_RY_gate(zyu[i], angle_y)
             circuit.add_CNOT_gate(zyu[i + 1], zyu[i])
-            angle_x = 2.0 * np.pi * rng.random()
-            angle_y = 2.0 * np.pi * rng.random()
-            circuit.add_parametric_RY_gate(zyu[i], -angle_y)
-            circuit.add_parametric_RX_gate(zyu[i], -angle_x)
+            circuit.add_parametric_RY_gate(zyu[i], -angle_y_inv)
+            circuit.add_parametric_RX_gate(zyu[i], -angle_x_inv)
     return circuit
 
 
@@ -214,17 +212,16 @@ def create_farhi_neven_watle_ansatz(
     rng = default_rng(seed)
     for _ in range(c_depth):
         rng.shuffle(zyu)
+        # Draw all angles of this layer at once. The order of random numbers is the same as drawing one by one.
+        angles = 2.0 * np.pi * rng.random(size=(n_qubit // 2, 4))
         for i in range(0, n_qubit - 1, 2):
-            angle_x = 2.0 * np.pi * rng.random()
-            angle_y = 2.0 * np.pi * rng.random()
+            angle_x, angle_y, angle_x_inv, angle_y_inv = angles[i // 2]
             circuit.add_CNOT_gate(zyu[i + 1], zyu[i])
             circuit.add_parametric_RX_gate(zyu[i], angle_x)
             circuit.add_parametric_RY_gate(zyu[i], angle_y)
             circuit.add_CNOT_gate(zyu[i + 1], zyu[i])
-            angle_x = 2.0 * np.pi * rng.random()
-            angle_y = 2.0 * np.pi * rng.random()
-            circuit.add_parametric_RY_gate(zyu[i], -angle_y)
-            circuit.add_parametric_RX_gate(zyu[i], -angle_x)
+            circuit.add_parametric_RY_gate(zyu[i], -angle_y_inv)
+            circuit.add_parametric_RX_gate(zyu[i], -angle_x_inv)
     return circuit
 
 
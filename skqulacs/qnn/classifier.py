@@ -5,10 +5,10 @@ from dataclasses import dataclass, field
 from typing import List, Optional, Tuple
 
 import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
 from numpy.typing import NDArray
-from qulacs import Observable, QuantumState
-from scipy.special import softmax
-from sklearn.metrics import log_loss
+from qulacs import Observable, PauliOperator, QuantumState
+from scipy.special import logsumexp, softmax
 from sklearn.preprocessing import MinMaxScaler
 from typing_extensions import Literal
 
@@ -16,6 +16,141 @@ from skqulacs.circuit import LearningCircuit
 from skqulacs.qnn.solver import Solver
 
 
+def _probabilities(state_vec: NDArray[np.complex_]) -> NDArray[np.float_]:
+    """Compute |amplitude|^2 of each basis.
+    Real and imaginary parts are read as views, so no complex temporary array is made.
+    """
+    probs: NDArray[np.float_] = np.square(state_vec.real) + np.square(state_vec.imag)
+    return probs
+
+
+# Above this number of qubits, <Z_i> is computed without `_z_sign_table` to save memory.
+_SIGN_TABLE_MAX_QUBIT = 10
+
+
+def _z_sign_table(n_qubit: int, n_row: int) -> NDArray[np.float_]:
+    """Make a table whose [i][k] element is the eigenvalue of Z_i for the k-th computational basis.
+    <Z_i> for i < n_row are computed as `table @ probs` with one matmul.
+    """
+    basis = np.arange(2**n_qubit)
+    bits = (basis[np.newaxis, :] >> np.arange(n_row)[:, np.newaxis]) & 1
+    # Stored as float64 so that matmul with probabilities does not cast it in every call.
+    table: NDArray[np.float_] = (1 - 2 * bits).astype(np.float64)
+    return table
+
+
+def _z_expectation_values(probs: NDArray[np.float_], n_row: int) -> NDArray[np.float_]:
+    """Compute <Z_i> for i < n_row from probabilities of computational bases without any table.
+    Bit i of the basis index is the middle axis of `probs.reshape(-1, 2, 2**i)`.
+    """
+    res = np.empty(n_row)
+    for i in range(n_row):
+        marginal = probs.reshape(-1, 2, 2**i).sum(axis=(0, 2))
+        res[i] = marginal[0] - marginal[1]
+    return res
+
+
+def _observable_terms(observable: Observable) -> List[Tuple[complex, str]]:
+    """List (coefficient, Pauli string) of each term of `observable`."""
+    terms = []
+    for k in range(observable.get_term_count()):
+        term = observable.get_term(k)
+        terms.append((term.get_coef(), term.get_pauli_string()))
+    return terms
+
+
+def _predict_samples(
+    circuit: LearningCircuit,
+    x_list: NDArray[np.float_],
+    num_class: int,
+    fitting_qubit: int,
+    manyclass: bool,
+    z_sign_table: Optional[NDArray[np.float_]],
+    observable_terms: Optional[List[List[Tuple[complex, str]]]],
+) -> NDArray[np.float_]:
+    """Run `circuit` for each sample and return the prediction before multiplied by `y_exp_ratio`.
+    This is a module-level function so that joblib can run it in worker processes.
+    """
+    n_qubit = circuit.n_qubit
+    res = np.zeros((len(x_list), num_class))
+    if manyclass:
+        for i in range(len(x_list)):
+            data_per = _probabilities(circuit.run_state_vector(x_list[i]))  # 2乗の和
+
+            if n_qubit != fitting_qubit:  # いくつかのビットを捨てる
+                data_per = data_per.reshape(
+                    (2 ** (n_qubit - fitting_qubit), 2**fitting_qubit)
+                )
+                data_per = data_per.sum(axis=0)
+
+            res[i] = data_per[0:num_class]
+
+    elif observable_terms is not None:
+        observables = [Observable(n_qubit) for _ in observable_terms]
+        for obs, terms in zip(observables, observable_terms):
+            for coef, pauli in terms:
+                obs.add_operator(coef, pauli)
+        for i in range(len(x_list)):
+            state = circuit.run(x_list[i])
+            for j, obs in enumerate(observables):
+                res[i][j] = obs.get_expectation_value(state)
+
+    else:
+        for i in range(len(x_list)):
+            probs = _probabilities(circuit.run_state_vector(x_list[i]))
+            if z_sign_table is not None:
+                res[i] = z_sign_table @ probs
+            else:
+                res[i] = _z_expectation_values(probs, num_class)
+
+    return res
+
+
+def _backprop_samples(
+    circuit: LearningCircuit,
+    x_scaled: NDArray[np.float_],
+    sample_diff: NDArray[np.float_],
+    manyclass: bool,
+    observable_terms: Optional[List[List[Tuple[complex, str]]]],
+) -> NDArray[np.float_]:
+    """Sum up gradients of `circuit` for each sample weighted by `sample_diff`.
+    This is a module-level function so that joblib can run it in worker processes.
+    """
+    n_qubit = circuit.n_qubit
+    grad = np.zeros(len(circuit.get_parameters()))
+    # Buffers reused among samples.
+    if manyclass:
+        ret = QuantumState(n_qubit)
+    else:
+        z_operators = [
+            PauliOperator(f"Z {i}", 1.0) for i in range(sample_diff.shape[1])
+        ]
+    for sample_index in range(len(x_scaled)):
+        if manyclass:
+            state_vec = circuit.run_state_vector(x_scaled[sample_index])
+            ret.load(sample_diff[sample_index] * state_vec * 2)
+            grad += circuit.backprop_inner_product(x_scaled[sample_index], ret)
+
+        elif observable_terms is not None:
+            backobs = Observable(n_qubit)
+            for current_class, terms in enumerate(observable_terms):
+                for coef, pauli in terms:
+                    backobs.add_operator(
+                        sample_diff[sample_index][current_class] * coef, pauli
+                    )
+            grad += circuit.backprop(x_scaled[sample_index], backobs)
+
+        else:
+            backobs = Observable(n_qubit)
+            for current_class, z_operator in enumerate(z_operators):
+                # `add_operator` copies the operator, so its coefficient can be overwritten.
+                z_operator.change_coef(sample_diff[sample_index][current_class])
+                backobs.add_operator(z_operator)
+            grad += circuit.backprop(x_scaled[sample_index], backobs)
+
+    return grad
+
+
 @dataclass(eq=False)
 class QNNClassifier:
     """Class to solve classification problems by quantum neural networks
@@ -34,6 +169,17 @@ class QNNClassifier:
             coeffcient used in the application of softmax function.
             the output prediction vector is made by transforming (<Z_0>, <Z_1>, ..., <Z_{n-1}>)
             to (y_1, y_2, ..., y_(n-1)) where y_i = e^{<Z_i>*y_exp_scale}/(sum_j e^{<Z_j>*y_exp_scale})
+        n_jobs:
+            The number of jobs to run samples in parallel in prediction and gradient computation.
+            None means 1 and -1 means using all processors, same as joblib.
+            Each job runs in a worker process on a copy of the circuit.
+            The cache of the circuit (`LearningCircuit.cache_size`) has no effect if n_jobs > 1.
+
+    With `manyclass=True` and `circuit.cache_size` at least the number of training samples,
+    the gradient reuses state vectors of the prediction at the same theta.
+
+    `observables` can be overwritten after construction to measure other operators than Z_i.
+    Only the first `num_class` observables are used, and they are ignored if `manyclass` is True.
 
     Examples:
         >>> from skqulacs.qnn import QNNClassifier
@@ -63,17 +209,29 @@ class QNNClassifier:
     x_norm_range: float = field(default=1.0)
     y_exp_ratio: float = field(default=2.2)
     manyclass: bool = field(default=False)
+    n_jobs: Optional[int] = field(default=None)
 
     observables: List[Observable] = field(init=False)
     n_qubit: int = field(init=False)
+    z_sign_table: Optional[NDArray[np.float_]] = field(init=False)
     x_scaler: MinMaxScaler = field(init=False)
     fitting_qubit: int = field(init=False)
+    # (theta, x, prediction) of the latest run in `cost_func` or `_cost_func_grad`.
+    # BFGS evaluates the cost and its gradient with the same theta, so they share one forward pass.
+    _pred_cache: Optional[Tuple[bytes, NDArray[np.float_], NDArray[np.float_]]] = field(
+        init=False, default=None
+    )
 
     def __post_init__(self) -> None:
         self.n_qubit = self.circuit.n_qubit
         self.observables = [Observable(self.n_qubit) for _ in range(self.n_qubit)]
         for i in range(self.n_qubit):
             self.observables[i].add_operator(1.0, f"Z {i}")
+        # The table takes num_class * 2^n_qubit floats, so it is only built for small circuits.
+        if not self.manyclass and self.n_qubit <= _SIGN_TABLE_MAX_QUBIT:
+            self.z_sign_table = _z_sign_table(self.n_qubit, self.num_class)
+        else:
+            self.z_sign_table = None
 
         self.fitting_qubit = math.ceil(math.log2(self.num_class - 0.001))
 
@@ -91,14 +249,24 @@ class QNNClassifier:
         """
         Args:
             x_train: List of training data inputs whose shape is (n_sample, n_features).
-            y_train: List of labels to fit. Labels must be represented as integers. Shape is (n_samples,)
+            y_train: List of labels to fit. Labels must be represented as integers in [0, num_class). Shape is (n_samples,)
             maxiter: The number of maximum iterations to pass scipy.optimize.minimize
         Returns:
             loss: Loss after learning.
             theta: Parameter theta after learning.
         """
 
-        y_scaled = y_train
+        # Labels are used as indices of outputs, so integral floats such as 0.0 are accepted too.
+        y_scaled = np.asarray(y_train).astype(np.int_)
+        if np.any(y_scaled != y_train) or np.any(
+            (y_scaled < 0) | (y_scaled >= self.num_class)
+        ):
+            raise ValueError(
+                f"y_train must be integers in [0, {self.num_class}) for num_class={self.num_class}."
+            )
+
+        # Circuits read samples row by row, so make rows contiguous float64 once here.
+        x_train = np.ascontiguousarray(x_train, dtype=np.float64)
         if x_train.ndim == 1:
             x_train = x_train.reshape((-1, 1))
 
@@ -107,6 +275,7 @@ class QNNClassifier:
         else:
             x_scaled = x_train
 
+        self._pred_cache = None
         theta_init = self.circuit.get_parameters()
         return self.solver.run(
             self.cost_func,
@@ -126,6 +295,7 @@ class QNNClassifier:
         Returns:
             y_pred: Predicted outcome whose shape is (n_samples,).
         """
+        x_test = np.ascontiguousarray(x_test, dtype=np.float64)
         if x_test.ndim == 1:
             x_test = x_test.reshape((-1, 1))
         if self.do_x_scale:
@@ -136,36 +306,73 @@ class QNNClassifier:
         y_pred: NDArray[np.int_] = self._predict_inner(x_scaled).argmax(axis=1)
         return y_pred
 
-    def _predict_inner(self, x_list: NDArray[np.float_]) -> NDArray[np.float_]:
-        res = np.zeros((len(x_list), self.num_class))
+    def _custom_observable_terms(self) -> Optional[List[List[Tuple[complex, str]]]]:
+        """Return terms of observables used for prediction, or None if they are the default Z_i.
+        Default observables are computed from probabilities without `Observable`.
+        """
         if self.manyclass:
-            for i in range(len(x_list)):
-                state_vec = self.circuit.run(x_list[i]).get_vector()
-                state_vec_conj = state_vec.conjugate()
-                data_per = (state_vec * state_vec_conj) * self.y_exp_ratio  # 2乗の和
-
-                if self.n_qubit != self.fitting_qubit:  # いくつかのビットを捨てる
-                    data_per = data_per.reshape(
-                        (
-                            2 ** (self.n_qubit - self.fitting_qubit),
-                            2**self.fitting_qubit,
-                        )
-                    )
-                    data_per = data_per.sum(axis=0)
-
-                res[i] = data_per[0 : self.num_class]
+            return None
+        terms = [_observable_terms(obs) for obs in self.observables[: self.num_class]]
+        if all(terms[i] == [(1.0, f"Z {i}")] for i in range(self.num_class)):
+            return None
+        return terms
 
+    def _predict_inner(self, x_list: NDArray[np.float_]) -> NDArray[np.float_]:
+        observable_terms = self._custom_observable_terms()
+        chunks = self._split_samples(len(x_list))
+        if len(chunks) <= 1:
+            res = _predict_samples(
+                self.circuit,
+                x_list,
+                self.num_class,
+                self.fitting_qubit,
+                self.manyclass,
+                self.z_sign_table,
+                observable_terms,
+            )
         else:
-            for i in range(len(x_list)):
-                state = self.circuit.run(x_list[i])
-                for j in range(self.num_class):
-                    res[i][j] = (
-                        self.observables[j].get_expectation_value(state)
-                        * self.y_exp_ratio
+            # Run in worker processes for the same reason as `_cost_func_grad`.
+            res = np.concatenate(
+                Parallel(n_jobs=self.n_jobs)(
+                    delayed(_predict_samples)(
+                        self.circuit,
+                        x_list[chunk],
+                        self.num_class,
+                        self.fitting_qubit,
+                        self.manyclass,
+                        self.z_sign_table,
+                        observable_terms,
                     )
+                    for chunk in chunks
+                )
+            )
 
+        res *= self.y_exp_ratio
         return res
 
+    def _split_samples(self, n_sample: int) -> List[slice]:
+        """Split indices of samples into contiguous chunks, one for each job."""
+        n_chunk = max(1, min(effective_n_jobs(self.n_jobs), n_sample))
+        bounds = np.linspace(0, n_sample, n_chunk + 1).astype(int)
+        return [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    def _predict_inner_cached(
+        self, theta: List[float], x_scaled: NDArray[np.float_]
+    ) -> NDArray[np.float_]:
+        """Update the circuit with `theta` and return `_predict_inner(x_scaled)`.
+        The result of the previous call is reused if both `theta` and `x_scaled` are unchanged.
+        """
+        self.circuit.update_parameters(theta)
+        theta_key = np.asarray(theta, dtype=np.float64).tobytes()
+        if self._pred_cache is not None:
+            cached_theta, cached_x, cached_pred = self._pred_cache
+            if cached_x is x_scaled and cached_theta == theta_key:
+                return cached_pred
+
+        y_pred = self._predict_inner(x_scaled)
+        self._pred_cache = (theta_key, x_scaled, y_pred)
+        return y_pred
+
     # TODO: Extract cost function to outer class to accept other type of ones.
     def cost_func(
         self,
@@ -174,10 +381,10 @@ class QNNClassifier:
         y_scaled: NDArray[np.int_],
     ) -> float:
         if self.cost == "log_loss":
-            self.circuit.update_parameters(theta)
-            y_pred = self._predict_inner(x_scaled)
-            y_pred_sm = softmax(y_pred, axis=1)
-            return log_loss(y_scaled, y_pred_sm)
+            y_pred = self._predict_inner_cached(theta, x_scaled)
+            # log(softmax(y_pred)) computed in log-space not to overflow in exp.
+            log_prob = y_pred - logsumexp(y_pred, axis=1, keepdims=True)
+            return float(-np.mean(log_prob[np.arange(len(x_scaled)), y_scaled]))
         else:
             raise NotImplementedError(
                 f"Cost function {self.cost} is not implemented yet."
@@ -189,38 +396,40 @@ class QNNClassifier:
         x_scaled: NDArray[np.float_],
         y_scaled: NDArray[np.int_],
     ) -> NDArray[np.float_]:
-        self.circuit.update_parameters(theta)
-        y_pred = self._predict_inner(x_scaled)
+        y_pred = self._predict_inner_cached(theta, x_scaled)
         y_pred_sm = softmax(y_pred, axis=1)
-        grad = np.zeros(len(theta))
-        for sample_index in range(len(x_scaled)):
-            if self.manyclass:
-                aaa = y_pred_sm[sample_index]
-                aaa[y_scaled[sample_index]] -= 1.0
-                aaa *= self.y_exp_ratio
-                aaa_kazu = np.concatenate(
-                    [aaa, np.zeros(2**self.fitting_qubit - self.num_class)]
-                )
-                convconv_diff = np.tile(
-                    aaa_kazu, 2 ** (self.n_qubit - self.fitting_qubit)
-                )
-                state_vec = self.circuit.run(x_scaled[sample_index]).get_vector()
-                ret = QuantumState(self.n_qubit)
-                ret.load(convconv_diff * state_vec * 2)
-                grad += self.circuit.backprop_inner_product(x_scaled[sample_index], ret)
+        # Derivative of the cost with respect to each (<Z_i> or probability), for all samples at once.
+        sample_diff = y_pred_sm.copy()
+        sample_diff[np.arange(len(x_scaled)), y_scaled] -= 1.0
+        sample_diff *= self.y_exp_ratio
+        if self.manyclass:
+            sample_diff = np.pad(
+                sample_diff, ((0, 0), (0, 2**self.fitting_qubit - self.num_class))
+            )
+            sample_diff = np.tile(
+                sample_diff, (1, 2 ** (self.n_qubit - self.fitting_qubit))
+            )
 
-            else:
-                backobs = Observable(self.n_qubit)
-                for current_class in range(self.num_class):
-                    expected = 0.0
-                    if current_class == y_scaled[sample_index]:
-                        expected = 1.0
-                    backobs.add_operator(
-                        (-expected + y_pred_sm[sample_index][current_class])
-                        * self.y_exp_ratio,
-                        f"Z {current_class}",
-                    )
-                grad += self.circuit.backprop(x_scaled[sample_index], backobs)
+        observable_terms = self._custom_observable_terms()
+        chunks = self._split_samples(len(x_scaled))
+        if len(chunks) <= 1:
+            grad = _backprop_samples(
+                self.circuit, x_scaled, sample_diff, self.manyclass, observable_terms
+            )
+        else:
+            # qulacs holds the GIL while running circuits, so chunks are run in worker processes.
+            # The circuit is pickled once for each chunk.
+            grads = Parallel(n_jobs=self.n_jobs)(
+                delayed(_backprop_samples)(
+                    self.circuit,
+                    x_scaled[chunk],
+                    sample_diff[chunk],
+                    self.manyclass,
+                    observable_terms,
+                )
+                for chunk in chunks
+            )
+            grad = np.add.reduce(grads)
 
         grad /= len(x_scaled)
         return grad
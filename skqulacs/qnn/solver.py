@@ -3,6 +3,7 @@ from dataclasses import dataclass
 from typing import Callable, List, Optional, Tuple
 
 import numpy as np
+from numpy.random import default_rng
 from numpy.typing import NDArray
 from scipy.optimize import minimize
 
@@ -84,11 +85,96 @@ class Bfgs(Solver):
         return loss, theta_opt
 
 
+@dataclass
+class LBfgsB(Solver):
+    """L-BFGS-B solver.
+
+    Args:
+        maxcor: The number of correction pairs kept to approximate the hessian.
+            Larger value needs more memory and fewer iterations.
+    """
+
+    maxcor: int = 20
+
+    def run(
+        self,
+        cost_func: CostFunc,
+        jac: Jacobian,
+        theta: List[float],
+        x: NDArray[np.float_],
+        y: NDArray[np.float_],
+        maxiter: Optional[int],
+    ) -> Tuple[float, List[float]]:
+        # The fortran routine of L-BFGS-B requires contiguous float64 arrays.
+        def jac_contiguous(
+            theta: List[float], x: NDArray[np.float_], y: NDArray[np.float_]
+        ) -> NDArray[np.float_]:
+            return np.ascontiguousarray(jac(theta, x, y), dtype=np.float64)
+
+        options = {"maxcor": self.maxcor}
+        if maxiter is not None:
+            options["maxiter"] = maxiter
+        result = minimize(
+            cost_func,
+            np.ascontiguousarray(theta, dtype=np.float64),
+            args=(x, y),
+            method="L-BFGS-B",
+            jac=jac_contiguous,
+            options=options,
+        )
+        loss = result.fun
+        theta_opt = result.x
+        return loss, theta_opt
+
+
+def _adam_update(
+    theta: NDArray[np.float_],
+    moment: NDArray[np.float_],
+    grad: NDArray[np.float_],
+    vel: float,
+    Bix: float,
+    Btx: float,
+    pr_A: float,
+    pr_Bi: float,
+    pr_Bt: float,
+    pr_ips: float,
+) -> Tuple[float, float, float]:
+    """Apply one step of Adam.
+    `theta` and `moment` are updated in place to avoid temporary arrays.
+
+    Returns:
+        (vel, Bix, Btx): Updated scalar states of Adam.
+    """
+    moment *= pr_Bi
+    moment += (1 - pr_Bi) * grad
+    vel = vel * pr_Bt + (1 - pr_Bt) * float(np.dot(grad, grad))
+    Bix = Bix * pr_Bi + (1 - pr_Bi)
+    Btx = Btx * pr_Bt + (1 - pr_Bt)
+    theta -= pr_A / (((vel / Btx) ** 0.5) + pr_ips) / Bix * moment
+    return vel, Bix, Btx
+
+
 @dataclass
 class Adam(Solver):
+    """Adam solver with mini-batches.
+    `maxiter` of `run()` is the number of epochs.
+    Each epoch visits all samples once in a shuffled order, `batch_size` samples per update.
+
+    Args:
+        callback: Function called with the parameters at the end of each epoch.
+            It is called only if `n_iter_no_change` is given.
+        tolerance: Minimum decrease of the cost in an epoch to be regarded as an improvement.
+        n_iter_no_change: Stop if the cost does not improve by `tolerance` in this number of consecutive epochs.
+            None disables the early stopping.
+        batch_size: The number of samples used in one update.
+        seed: Seed to shuffle samples. Same seed gives the same result for the same input.
+    """
+
     callback: Optional[Callable[[List[float]], None]] = None
     tolerance: float = 1e-4
     n_iter_no_change: Optional[int] = None
+    batch_size: int = 5
+    seed: Optional[int] = 0
 
     def run(
         self,
@@ -99,6 +185,8 @@ class Adam(Solver):
         y: NDArray[np.float_],
         maxiter: Optional[int],
     ) -> Tuple[float, List[float]]:
+        if maxiter is None:
+            raise ValueError("Adam needs maxiter, the number of epochs.")
         pr_A = 0.02
         pr_Bi = 0.8
         pr_Bt = 0.995
@@ -108,27 +196,32 @@ class Adam(Solver):
         Btx = 0.0
 
         moment = np.zeros(len(theta))
-        vel = 0
-        theta_now = theta
-        maxiter *= len(x)
-        prev_cost = cost_func(theta_now, x, y)
+        vel = 0.0
+        theta_now = np.array(theta, dtype=np.float64)
+        x = np.asarray(x)
+        y = np.asarray(y)
+        rng = default_rng(self.seed)
+        # `theta_now` is updated in place, and passed to functions as a list of its current values.
+        prev_cost = cost_func(theta_now.tolist(), x, y)
+        # Cost with the current `theta_now` if it has been evaluated. Used to skip recomputation at the end.
+        last_cost: Optional[float] = prev_cost
 
         no_change = 0
-        for iter in range(0, maxiter, 5):
-            grad = jac(
-                theta_now,
-                x[iter % len(x) : iter % len(x) + 5],
-                y[iter % len(y) : iter % len(y) + 5],
-            )
-            moment = moment * pr_Bi + (1 - pr_Bi) * grad
-            vel = vel * pr_Bt + (1 - pr_Bt) * np.dot(grad, grad)
-            Bix = Bix * pr_Bi + (1 - pr_Bi)
-            Btx = Btx * pr_Bt + (1 - pr_Bt)
-            theta_now -= pr_A / (((vel / Btx) ** 0.5) + pr_ips) * (moment / Bix)
-            if (self.n_iter_no_change is not None) and (iter % len(x) < 5):
+        # `maxiter` is the number of epochs. Each epoch visits all samples once in a shuffled order.
+        for _ in range(maxiter):
+            perm = rng.permutation(len(x))
+            for start in range(0, len(x), self.batch_size):
+                batch = perm[start : start + self.batch_size]
+                grad = jac(theta_now.tolist(), x[batch], y[batch])
+                vel, Bix, Btx = _adam_update(
+                    theta_now, moment, grad, vel, Bix, Btx, pr_A, pr_Bi, pr_Bt, pr_ips
+                )
+            last_cost = None
+            if self.n_iter_no_change is not None:
                 if self.callback is not None:
-                    self.callback(theta_now)
-                now_cost = cost_func(theta_now, x, y)
+                    self.callback(theta_now.tolist())
+                now_cost = cost_func(theta_now.tolist(), x, y)
+                last_cost = now_cost
                 if prev_cost - self.tolerance < now_cost:
                     no_change = no_change + 1
                     if no_change >= self.n_iter_no_change:
@@ -137,8 +230,11 @@ class Adam(Solver):
                     no_change = 0
                 prev_cost = now_cost
 
-        loss = cost_func(theta_now, x, y)
-        theta_opt = theta_now
+        if last_cost is not None:
+            loss = last_cost
+        else:
+            loss = cost_func(theta_now.tolist(), x, y)
+        theta_opt = theta_now.tolist()
         return loss, theta_opt
 
 
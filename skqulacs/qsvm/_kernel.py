@@ -0,0 +1,32 @@
+import numpy as np
+from numpy.typing import NDArray
+from scipy.linalg.blas import zherk
+
+
+def gram_kernel(data_vectors: NDArray[np.complex_]) -> NDArray[np.float_]:
+    """Compute the kernel |<psi_i|psi_j>|^2 among all pairs of state vectors.
+
+    The kernel is symmetric, so only the upper triangle is computed by BLAS and mirrored.
+
+    Args:
+        data_vectors: State vectors whose shape is (n_samples, 2^n_qubit).
+    """
+    # data_vectors.T is Fortran-ordered, so zherk takes it without copying.
+    upper: NDArray[np.float_] = (
+        np.abs(np.triu(zherk(1.0, data_vectors.T, trans=2))) ** 2
+    )
+    kernel: NDArray[np.float_] = upper + np.triu(upper, 1).T
+    return kernel
+
+
+def cross_kernel(
+    x_vectors: NDArray[np.complex_], data_vectors: NDArray[np.complex_]
+) -> NDArray[np.float_]:
+    """Compute the kernel |<x_i|data_j>|^2 between two sets of state vectors.
+
+    Args:
+        x_vectors: State vectors whose shape is (n_x, 2^n_qubit).
+        data_vectors: State vectors whose shape is (n_data, 2^n_qubit).
+    """
+    kernel: NDArray[np.float_] = np.abs(x_vectors.conj() @ data_vectors.T) ** 2
+    return kernel
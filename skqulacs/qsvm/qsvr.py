@@ -1,9 +1,9 @@
 import numpy as np
 from numpy.typing import NDArray
-from qulacs.state import inner_product
 from sklearn import svm
 
 from skqulacs.circuit import LearningCircuit
+from skqulacs.qsvm._kernel import cross_kernel, gram_kernel
 
 
 class QSVR:
@@ -15,7 +15,7 @@ class QSVR:
         """
         self.svr = svm.SVR(kernel="precomputed")
         self.circuit = circuit
-        self.data_states = []
+        self.data_vectors: NDArray[np.complex_] = np.zeros((0, 0), dtype=np.complex128)
         self.n_qubit = 0
 
     def fit(self, x: NDArray[np.float_], y: NDArray[np.int_]):
@@ -25,16 +25,13 @@ class QSVR:
         :param y: training teacher values
         """
         self.n_qubit = len(x[0])
-        kar = np.zeros((len(x), len(x)))
         # Compute UΦx to get kernel of `x` and `y`.
-        for i in range(len(x)):
-            self.data_states.append(self.circuit.run(x[i]))
+        self.data_vectors = np.stack(
+            [self.circuit.run_state_vector(x[i]) for i in range(len(x))]
+        )
 
-        for i in range(len(x)):
-            for j in range(len(x)):
-                kar[i][j] = (
-                    abs(inner_product(self.data_states[i], self.data_states[j])) ** 2
-                )
+        # kar[i][j] = |<data_vectors[i]|data_vectors[j]>|^2
+        kar = gram_kernel(self.data_vectors)
 
         self.svr.fit(kar, y)
 
@@ -44,9 +41,8 @@ class QSVR:
         :param xs: inputs to make predictions
         :return: List[int], predicted values of y
         """
-        kar = np.zeros((len(xs), len(self.data_states)))
-        for i in range(len(xs)):
-            x_qc = self.circuit.run(xs[i])
-            for j in range(len(self.data_states)):
-                kar[i][j] = abs(inner_product(x_qc, self.data_states[j])) ** 2
+        x_vectors = np.stack(
+            [self.circuit.run_state_vector(xs[i]) for i in range(len(xs))]
+        )
+        kar = cross_kernel(x_vectors, self.data_vectors)
         return self.svr.predict(kar)
@@ -1,3 +1,7 @@
+from copy import deepcopy
+
+import numpy as np
+
 from skqulacs.circuit import LearningCircuit
 
 
@@ -87,3 +91,37 @@ def test_share_coef_input_learning_parameter() -> None:
     state_without_share = circuit_without_share.run([])
     for v, w in zip(state.get_vector(), state_without_share.get_vector()):
         assert v == w
+
+
+def test_run_state_vector_cache() -> None:
+    circuit = LearningCircuit(2, cache_size=1)
+    circuit.add_input_RX_gate(0)
+    circuit.add_parametric_RY_gate(1, 0.5)
+    state_vec = circuit.run_state_vector([0.3])
+    assert np.allclose(state_vec, circuit.run([0.3]).get_vector())
+    assert circuit.run_state_vector([0.3]) is state_vec
+
+    circuit.update_parameters([0.7])
+    updated = circuit.run_state_vector([0.3])
+    assert updated is not state_vec
+    assert np.allclose(updated, circuit.run([0.3]).get_vector())
+    # Updating with the same parameters keeps the cache.
+    circuit.update_parameters([0.7])
+    assert circuit.run_state_vector([0.3]) is updated
+
+    # Only the latest state vector is kept with `cache_size=1`.
+    circuit.run_state_vector([0.1])
+    assert circuit.run_state_vector([0.3]) is not updated
+
+
+def test_copy_without_cache() -> None:
+    circuit = LearningCircuit(2, cache_size=1)
+    circuit.add_input_RX_gate(0)
+    circuit.add_parametric_RY_gate(1, 0.5)
+    state_vec = circuit.run_state_vector([0.3])
+
+    # `deepcopy` goes through `__getstate__` in the same way as pickling by joblib.
+    copied = deepcopy(circuit)
+    assert len(copied._state_vector_cache) == 0
+    assert copied.get_parameters() == circuit.get_parameters()
+    assert np.allclose(copied.run_state_vector([0.3]), state_vec)
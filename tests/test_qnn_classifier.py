@@ -1,17 +1,245 @@
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
 import pandas as pd
 import pytest
+from numpy.typing import NDArray
+from qulacs import Observable, QuantumState
+from scipy.special import softmax
 from sklearn import datasets
-from sklearn.metrics import f1_score
+from sklearn.metrics import f1_score, log_loss
 from sklearn.model_selection import train_test_split
 
 from skqulacs.circuit.pre_defined import create_qcl_ansatz
 from skqulacs.qnn import QNNClassifier
-from skqulacs.qnn.solver import Adam, Bfgs, Solver
+from skqulacs.qnn.classifier import _z_expectation_values, _z_sign_table
+from skqulacs.qnn.solver import Adam, Bfgs, LBfgsB, Solver
+
+
+@pytest.mark.parametrize("n_jobs", [None, 2])
+def test_predict_inner_matches_observables(n_jobs: Optional[int]) -> None:
+    n_qubit = 4
+    num_class = 3
+    circuit = create_qcl_ansatz(n_qubit, 2, 0.5, 0)
+    qcl = QNNClassifier(circuit, num_class, Bfgs(), n_jobs=n_jobs)
+    x_list = np.random.default_rng(0).uniform(-1.0, 1.0, size=(5, 2))
+
+    y_pred = qcl._predict_inner(x_list)
+
+    expected = np.array(
+        [
+            [
+                qcl.observables[j].get_expectation_value(circuit.run(x))
+                * qcl.y_exp_ratio
+                for j in range(num_class)
+            ]
+            for x in x_list
+        ]
+    )
+    assert np.allclose(y_pred, expected)
+
+
+def test_custom_observables() -> None:
+    n_qubit = 4
+    num_class = 3
+    circuit = create_qcl_ansatz(n_qubit, 2, 0.5, 0)
+    qcl = QNNClassifier(circuit, num_class, Bfgs(), do_x_scale=False)
+    qcl.observables = [Observable(n_qubit) for _ in range(n_qubit)]
+    qcl.observables[0].add_operator(1.0, "Z 0")
+    qcl.observables[1].add_operator(0.5, "X 1 Z 2")
+    qcl.observables[2].add_operator(1.0, "I 2")
+    x_list = np.random.default_rng(0).uniform(-1.0, 1.0, size=(5, 2))
+    y_list = np.arange(5) % num_class
+
+    y_pred = qcl._predict_inner(x_list)
+
+    expected = np.array(
+        [
+            [
+                qcl.observables[j].get_expectation_value(circuit.run(x))
+                * qcl.y_exp_ratio
+                for j in range(num_class)
+            ]
+            for x in x_list
+        ]
+    )
+    assert np.allclose(y_pred, expected)
+
+    # The gradient is also taken with respect to the overwritten observables.
+    theta = np.array(circuit.get_parameters())
+    grad = qcl._cost_func_grad(theta.tolist(), x_list, y_list)
+    eps = 1e-6
+    for k in range(len(theta)):
+        d = np.zeros(len(theta))
+        d[k] = eps
+        numerical = (
+            qcl.cost_func((theta + d).tolist(), x_list, y_list)
+            - qcl.cost_func((theta - d).tolist(), x_list, y_list)
+        ) / (2 * eps)
+        assert np.isclose(grad[k], numerical, atol=1e-6)
+
+
+def test_z_expectation_values_without_table() -> None:
+    n_qubit = 4
+    state_vec = np.random.default_rng(0).normal(size=2**n_qubit)
+    probs = state_vec**2 / np.sum(state_vec**2)
+
+    expected = _z_sign_table(n_qubit, 3) @ probs
+    assert np.allclose(_z_expectation_values(probs, 3), expected)
+
+
+def test_cost_func_matches_log_loss() -> None:
+    num_class = 3
+    circuit = create_qcl_ansatz(4, 2, 0.5, 0)
+    qcl = QNNClassifier(circuit, num_class, Bfgs())
+    x_list = np.random.default_rng(0).uniform(-1.0, 1.0, size=(6, 2))
+    # Labels of a minibatch do not always contain all classes.
+    y_list = np.array([0, 2, 0, 2, 2, 0])
+    theta = circuit.get_parameters()
+
+    cost = qcl.cost_func(theta, x_list, y_list)
+
+    y_pred_sm = softmax(qcl._predict_inner(x_list), axis=1)
+    assert np.isclose(cost, log_loss(y_list, y_pred_sm, labels=range(num_class)))
+
+
+@pytest.mark.parametrize("manyclass", [False, True])
+def test_cost_func_grad_parallel(manyclass: bool) -> None:
+    n_qubit = 4
+    num_class = 3
+    circuit = create_qcl_ansatz(n_qubit, 2, 0.5, 0)
+    rng = np.random.default_rng(0)
+    x_list = rng.uniform(-1.0, 1.0, size=(7, 2))
+    y_list = rng.integers(0, num_class, size=7)
+    theta = circuit.get_parameters()
+
+    serial = QNNClassifier(circuit, num_class, Bfgs(), manyclass=manyclass)
+    grad_serial = serial._cost_func_grad(theta, x_list, y_list)
+    parallel = QNNClassifier(circuit, num_class, Bfgs(), manyclass=manyclass, n_jobs=2)
+    grad_parallel = parallel._cost_func_grad(theta, x_list, y_list)
+
+    assert np.allclose(grad_serial, grad_parallel)
+
+
+def test_cost_func_and_grad_share_prediction(monkeypatch: pytest.MonkeyPatch) -> None:
+    n_qubit = 4
+    num_class = 3
+    circuit = create_qcl_ansatz(n_qubit, 2, 0.5, 0)
+    rng = np.random.default_rng(0)
+    x_list = rng.uniform(-1.0, 1.0, size=(7, 2))
+    y_list = np.arange(7) % num_class
+    theta = circuit.get_parameters()
+    theta_moved = (np.array(theta) + 0.1).tolist()
+    qcl = QNNClassifier(circuit, num_class, Bfgs())
+    grad_expected = qcl._cost_func_grad(theta, x_list, y_list)
+
+    n_call = 0
+    predict_inner = qcl._predict_inner
+
+    def counting_predict_inner(x: NDArray[np.float_]) -> NDArray[np.float_]:
+        nonlocal n_call
+        n_call += 1
+        return predict_inner(x)
+
+    monkeypatch.setattr(qcl, "_predict_inner", counting_predict_inner)
+    qcl.cost_func(theta_moved, x_list, y_list)
+    grad = qcl._cost_func_grad(theta_moved, x_list, y_list)
+    assert n_call == 1
+    qcl._cost_func_grad(theta, x_list, y_list)
+    assert n_call == 2
+    assert not np.allclose(grad, grad_expected)
+    assert np.allclose(qcl._cost_func_grad(theta, x_list, y_list), grad_expected)
+
+
+def test_fit_reuses_cached_state_vectors(monkeypatch: pytest.MonkeyPatch) -> None:
+    n_qubit = 4
+    num_class = 3
+    circuit = create_qcl_ansatz(n_qubit, 2, 0.5, 0)
+    rng = np.random.default_rng(0)
+    x_list = rng.uniform(-1.0, 1.0, size=(7, 2))
+    y_list = np.arange(7) % num_class
+    circuit.cache_size = len(x_list)
+    qcl = QNNClassifier(circuit, num_class, Bfgs(), manyclass=True)
+
+    n_run = 0
+    n_run_state_vector = 0
+    run = circuit.run
+    run_state_vector = circuit.run_state_vector
+
+    def counting_run(x: List[float]) -> QuantumState:
+        nonlocal n_run
+        n_run += 1
+        return run(x)
+
+    def counting_run_state_vector(x: List[float]) -> NDArray[np.complex_]:
+        nonlocal n_run_state_vector
+        n_run_state_vector += 1
+        return run_state_vector(x)
+
+    monkeypatch.setattr(circuit, "run", counting_run)
+    monkeypatch.setattr(circuit, "run_state_vector", counting_run_state_vector)
+    qcl.fit(x_list, y_list, maxiter=5)
+    # The gradient reuses state vectors of the prediction at the same theta instead of running the circuit.
+    assert n_run < n_run_state_vector
+
+
+def test_cost_func_grad_keeps_parameters() -> None:
+    circuit = create_qcl_ansatz(4, 2, 0.5, 0)
+    qcl = QNNClassifier(circuit, 3, Bfgs())
+    x_list = np.random.default_rng(0).uniform(-1.0, 1.0, size=(6, 2))
+    y_list = np.arange(6) % 3
+    theta = (np.array(circuit.get_parameters()) + 0.1).tolist()
+
+    qcl._cost_func_grad(theta, x_list, y_list)
+
+    assert np.allclose(circuit.get_parameters(), theta)
+
+
+@pytest.mark.parametrize(
+    "y_train",
+    [
+        # Label 2 is trained on the 2nd output even though label 1 is missing.
+        [0, 2, 0, 2],
+        [0.0, 2.0, 0.0, 2.0],
+        [1, 2, 1, 2],
+    ],
+)
+def test_fit_keeps_class_indices(
+    monkeypatch: pytest.MonkeyPatch, y_train: List[float]
+) -> None:
+    circuit = create_qcl_ansatz(4, 2, 0.5, 0)
+    qcl = QNNClassifier(circuit, 3, Bfgs())
+    y_scaled: Any = None
+
+    def run(
+        cost_func: Any, jac: Any, theta: List[float], x: Any, y: Any, maxiter: Any
+    ) -> Tuple[float, List[float]]:
+        nonlocal y_scaled
+        y_scaled = y
+        return 0.0, theta
+
+    monkeypatch.setattr(qcl.solver, "run", run)
+    qcl.fit(np.zeros((4, 2)), np.array(y_train))
+    assert np.array_equal(y_scaled, y_train)
+
+
+@pytest.mark.parametrize(
+    "y_train", [[0, 3, 0, 3], [0, -1, 0, -1], [0.0, 0.5, 0.0, 0.5]]
+)
+def test_fit_rejects_invalid_labels(y_train: List[float]) -> None:
+    circuit = create_qcl_ansatz(4, 2, 0.5, 0)
+    qcl = QNNClassifier(circuit, 3, Bfgs())
+    with pytest.raises(ValueError):
+        qcl.fit(np.zeros((4, 2)), np.array(y_train))
 
 
 @pytest.mark.parametrize(
     ("solver", "maxiter"),
-    [(Adam(tolerance=1e-2, n_iter_no_change=5), 777), (Bfgs(), 8)],
+    [
+        (Adam(tolerance=1e-2, n_iter_no_change=5), 777),
+        (Bfgs(), 8),
+        (LBfgsB(), 8),
+    ],
 )
 def test_classify_iris(solver: Solver, maxiter: int) -> None:
     iris = datasets.load_iris()
@@ -2,10 +2,12 @@ import random
 
 import numpy as np
 from numpy.random import RandomState
+from qulacs.state import inner_product
 from sklearn.metrics import mean_squared_error
 
 from skqulacs.circuit import create_ibm_embedding_circuit
 from skqulacs.qsvm import QSVR
+from skqulacs.qsvm._kernel import gram_kernel
 
 
 def func_to_learn(x):
@@ -45,6 +47,17 @@ def test_noisy_sine():
     assert loss < 0.008
 
 
+def test_gram_kernel_matches_inner_product() -> None:
+    circuit = create_ibm_embedding_circuit(4)
+    x_list, _ = generate_noisy_sine(-0.5, 0.5, 10)
+    states = [circuit.run(x) for x in x_list]
+    expected = np.array(
+        [[abs(inner_product(a, b)) ** 2 for b in states] for a in states]
+    )
+    kernel = gram_kernel(np.stack([state.get_vector() for state in states]))
+    assert np.allclose(kernel, expected)
+
+
 def main():
     test_noisy_sine()
 
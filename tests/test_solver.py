@@ -0,0 +1,57 @@
+from typing import List
+
+import numpy as np
+from numpy.typing import NDArray
+
+from skqulacs.qnn.solver import Adam
+
+
+def cost_func(
+    theta: List[float], x: NDArray[np.float_], y: NDArray[np.float_]
+) -> float:
+    return float(np.sum((np.array(theta) - np.mean(y)) ** 2))
+
+
+def jac(
+    theta: List[float], x: NDArray[np.float_], y: NDArray[np.float_]
+) -> NDArray[np.float_]:
+    grad: NDArray[np.float_] = 2 * (np.array(theta) - np.mean(y))
+    return grad
+
+
+def test_adam_visits_all_samples_in_each_epoch() -> None:
+    n_sample = 12
+    batch_size = 5
+    maxiter = 3
+    x = np.arange(n_sample, dtype=np.float64).reshape((-1, 1))
+    y = np.arange(n_sample, dtype=np.float64)
+    visited: List[float] = []
+
+    def recording_jac(
+        theta: List[float], x_batch: NDArray[np.float_], y_batch: NDArray[np.float_]
+    ) -> NDArray[np.float_]:
+        assert len(x_batch) <= batch_size
+        # `x` and `y` of a sample are kept together in a batch.
+        assert np.array_equal(x_batch[:, 0], y_batch)
+        visited.extend(y_batch)
+        return jac(theta, x_batch, y_batch)
+
+    Adam(batch_size=batch_size).run(cost_func, recording_jac, [0.0], x, y, maxiter)
+
+    assert len(visited) == n_sample * maxiter
+    for epoch in range(maxiter):
+        samples = visited[epoch * n_sample : (epoch + 1) * n_sample]
+        assert sorted(samples) == list(y)
+
+
+def test_adam_seed() -> None:
+    x = np.zeros((12, 1))
+    y = np.arange(12, dtype=np.float64)
+
+    loss, theta = Adam(seed=1).run(cost_func, jac, [0.0], x, y, 5)
+    same_loss, same_theta = Adam(seed=1).run(cost_func, jac, [0.0], x, y, 5)
+    _, other_theta = Adam(seed=2).run(cost_func, jac, [0.0], x, y, 5)
+
+    assert loss == same_loss
+    assert theta == same_theta
+    assert theta != other_theta